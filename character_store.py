@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Character Store
+Embedded SQLite database holding chapters, characters, aliases, relationships
+and mentions for every processed book. The TypeScript exporters read from it,
+so re-runs only touch the rows that changed.
+
+Usage:
+    python character_store.py      # list stored books
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from cooccurrence import find_mentions
+
+# ====== CONFIGURATION ======
+STORE_PATH = ".character_store.db"  # gitignored
+# ===========================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE,
+    author TEXT,
+    year INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS chapters (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    indexed INTEGER NOT NULL DEFAULT 0,   -- mentions are up to date with text and aliases
+    PRIMARY KEY (book_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS characters (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    role TEXT NOT NULL,
+    appearances INTEGER NOT NULL,
+    PRIMARY KEY (book_id, key)
+);
+
+CREATE TABLE IF NOT EXISTS aliases (
+    book_id INTEGER NOT NULL,
+    alias TEXT NOT NULL,
+    character_key TEXT NOT NULL,
+    PRIMARY KEY (book_id, alias, character_key),
+    FOREIGN KEY (book_id, character_key) REFERENCES characters(book_id, key) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_aliases_alias ON aliases(alias);
+
+CREATE TABLE IF NOT EXISTS relationships (
+    book_id INTEGER NOT NULL,
+    character_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    target TEXT NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (book_id, character_key, target, type),
+    FOREIGN KEY (book_id, character_key) REFERENCES characters(book_id, key) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_relationships_target ON relationships(book_id, target);
+
+CREATE TABLE IF NOT EXISTS mentions (
+    book_id INTEGER NOT NULL,
+    chapter TEXT NOT NULL,
+    character_key TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    PRIMARY KEY (book_id, chapter, offset),
+    FOREIGN KEY (book_id, chapter) REFERENCES chapters(book_id, name) ON DELETE CASCADE,
+    FOREIGN KEY (book_id, character_key) REFERENCES characters(book_id, key) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_mentions_character ON mentions(book_id, character_key);
+"""
+
+
+class CharacterStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+
+    def _migrate(self):
+        """Bring stores created by older versions up to SCHEMA"""
+        with self.transaction() as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(chapters)")}
+            if columns and "indexed" not in columns:
+                conn.execute("ALTER TABLE chapters ADD COLUMN indexed INTEGER NOT NULL DEFAULT 0")
+            references = {row[2] for row in conn.execute("PRAGMA foreign_key_list(mentions)")}
+            if references and "characters" not in references:
+                # Mentions are derived data; they are rebuilt on the next index_mentions()
+                conn.execute("DROP TABLE mentions")
+                conn.execute("UPDATE chapters SET indexed = 0")
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def transaction(self):
+        with self.conn:
+            yield self.conn
+
+    def _delete_missing(self, conn, table, column, book_id, keep):
+        """Delete the book's rows in table whose column value is not in keep"""
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_keys (key TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM keep_keys")
+        conn.executemany("INSERT OR IGNORE INTO keep_keys VALUES (?)", [(key,) for key in keep])
+        return conn.execute(
+            f"DELETE FROM {table} WHERE book_id = ? AND {column} NOT IN (SELECT key FROM keep_keys)",
+            (book_id,)
+        ).rowcount
+
+    # ---------- books ----------
+
+    def book_id(self, title, author=None, year=None):
+        """Get (creating or updating metadata as needed) the id of a book"""
+        with self.transaction() as conn:
+            conn.execute(
+                """INSERT INTO books (title, author, year) VALUES (?, ?, ?)
+                   ON CONFLICT(title) DO UPDATE SET
+                       author = COALESCE(excluded.author, books.author),
+                       year = COALESCE(excluded.year, books.year)""",
+                (title, author, year)
+            )
+            return conn.execute("SELECT id FROM books WHERE title = ?", (title,)).fetchone()[0]
+
+    def list_books(self):
+        return [
+            {"title": title, "author": author, "year": year, "chapters": n_chapters, "characters": n_characters}
+            for title, author, year, n_chapters, n_characters in self.conn.execute(
+                """SELECT b.title, b.author, b.year,
+                          (SELECT COUNT(*) FROM chapters c WHERE c.book_id = b.id),
+                          (SELECT COUNT(*) FROM characters c WHERE c.book_id = b.id)
+                   FROM books b ORDER BY b.title"""
+            )
+        ]
+
+    # ---------- chapters ----------
+
+    def upsert_chapters(self, book_id, chapters, prune=False):
+        """chapters: list of {"chapter": name, "text": text} in reading order;
+        prune=True deletes chapters not in the list"""
+        with self.transaction() as conn:
+            conn.executemany(
+                """INSERT INTO chapters (book_id, name, position, text) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(book_id, name) DO UPDATE SET
+                       position = excluded.position, text = excluded.text,
+                       indexed = chapters.indexed AND chapters.text = excluded.text
+                   WHERE chapters.position != excluded.position OR chapters.text != excluded.text""",
+                [(book_id, ch["chapter"], position, ch["text"]) for position, ch in enumerate(chapters)]
+            )
+            if prune:
+                self._delete_missing(conn, "chapters", "name", book_id, [ch["chapter"] for ch in chapters])
+
+    def load_chapters(self, book_id):
+        return [
+            {"chapter": name, "text": text}
+            for name, text in self.conn.execute(
+                "SELECT name, text FROM chapters WHERE book_id = ? ORDER BY position", (book_id,)
+            )
+        ]
+
+    # ---------- characters ----------
+
+    def upsert_characters(self, book_id, characters, prune=False):
+        """Bulk upsert characters (in the dict format the scripts use) with their
+        aliases and relationships; prune=True deletes characters not in the dict.
+        Only rows whose content changed are written."""
+        keys = list(characters)
+        with self.transaction() as conn:
+            conn.executemany(
+                """INSERT INTO characters (book_id, key, position, name, description, role, appearances)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(book_id, key) DO UPDATE SET
+                       position = excluded.position, name = excluded.name,
+                       description = excluded.description, role = excluded.role,
+                       appearances = excluded.appearances
+                   WHERE characters.position != excluded.position OR characters.name != excluded.name
+                      OR characters.description != excluded.description OR characters.role != excluded.role
+                      OR characters.appearances != excluded.appearances""",
+                [
+                    # "or": the LLM sometimes returns null for a field
+                    (book_id, key, position, char.get('name') or key,
+                     char.get('description') or 'A character in the story.',
+                     char.get('role') or 'Supporting Character', char.get('appearances') or 1)
+                    for position, (key, char) in enumerate(characters.items())
+                ]
+            )
+
+            # Relationships: rewrite only characters whose list changed
+            stored = {}
+            for key, target, rel_type in conn.execute(
+                "SELECT character_key, target, type FROM relationships WHERE book_id = ? ORDER BY character_key, position",
+                (book_id,)
+            ):
+                stored.setdefault(key, []).append((target, rel_type))
+            relationships = {
+                key: list(dict.fromkeys(
+                    (rel.get('character') or '', rel.get('type') or '') for rel in char.get('relationships') or []
+                ))
+                for key, char in characters.items()
+            }
+            changed = [key for key in keys if stored.get(key, []) != relationships[key]]
+            conn.executemany(
+                "DELETE FROM relationships WHERE book_id = ? AND character_key = ?",
+                [(book_id, key) for key in changed]
+            )
+            conn.executemany(
+                "INSERT INTO relationships (book_id, character_key, position, target, type) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (book_id, key, position, target, rel_type)
+                    for key in changed
+                    for position, (target, rel_type) in enumerate(relationships[key])
+                ]
+            )
+
+            # Aliases: same, and any change means chapters need re-indexing
+            stored = {}
+            for alias, key in conn.execute("SELECT alias, character_key FROM aliases WHERE book_id = ?", (book_id,)):
+                stored.setdefault(key, set()).add(alias)
+            aliases = {key: {key, char.get('name') or key} for key, char in characters.items()}
+            changed = [key for key in keys if stored.get(key, set()) != aliases[key]]
+            conn.executemany(
+                "DELETE FROM aliases WHERE book_id = ? AND character_key = ?",
+                [(book_id, key) for key in changed]
+            )
+            conn.executemany(
+                "INSERT INTO aliases (book_id, alias, character_key) VALUES (?, ?, ?)",
+                [(book_id, alias, key) for key in changed for alias in aliases[key]]
+            )
+
+            deleted = self._delete_missing(conn, "characters", "key", book_id, keys) if prune else 0
+            if changed or deleted:
+                conn.execute("UPDATE chapters SET indexed = 0 WHERE book_id = ?", (book_id,))
+
+    def load_characters(self, book_id):
+        """Characters in the dict format generate_typescript_characters expects"""
+        characters = {}
+        for key, name, description, role, appearances in self.conn.execute(
+            """SELECT key, name, description, role, appearances FROM characters
+               WHERE book_id = ? ORDER BY position""", (book_id,)
+        ):
+            characters[key] = {
+                "name": name,
+                "description": description,
+                "role": role,
+                "appearances": appearances
+            }
+
+        for key, target, rel_type in self.conn.execute(
+            """SELECT character_key, target, type FROM relationships
+               WHERE book_id = ? ORDER BY character_key, position""", (book_id,)
+        ):
+            if key in characters:
+                characters[key].setdefault("relationships", []).append({"character": target, "type": rel_type})
+
+        return characters
+
+    def known_names(self, title):
+        """Every alias stored for a book by previous runs (empty if the book is new)"""
+        return {
+            alias for (alias,) in self.conn.execute(
+                "SELECT a.alias FROM aliases a JOIN books b ON b.id = a.book_id WHERE b.title = ?", (title,)
+            )
+        }
+
+    def find_character(self, alias):
+        """Look up a character by key or full name across all books"""
+        return [
+            {"book": title, "key": key}
+            for title, key in self.conn.execute(
+                """SELECT b.title, a.character_key FROM aliases a JOIN books b ON b.id = a.book_id
+                   WHERE a.alias = ?""", (alias,)
+            )
+        ]
+
+    # ---------- mentions ----------
+
+    def replace_mentions(self, book_id, chapter, mentions):
+        """Replace the mentions of one chapter; mentions: list of (character key, offset)"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM mentions WHERE book_id = ? AND chapter = ?", (book_id, chapter))
+            conn.executemany(
+                "INSERT OR IGNORE INTO mentions (book_id, chapter, character_key, offset) VALUES (?, ?, ?, ?)",
+                [(book_id, chapter, key, int(offset)) for key, offset in mentions]
+            )
+
+    def index_mentions(self, book_id):
+        """Find and store character mentions in chapters whose text or the
+        book's aliases changed since they were last indexed"""
+        pending = self.conn.execute(
+            "SELECT name, text FROM chapters WHERE book_id = ? AND indexed = 0", (book_id,)
+        ).fetchall()
+        if not pending:
+            return
+        characters = {
+            key: {"name": name}
+            for key, name in self.conn.execute("SELECT key, name FROM characters WHERE book_id = ?", (book_id,))
+        }
+        for chapter, text in pending:
+            keys, (rows, offsets) = find_mentions(text, characters)
+            self.replace_mentions(book_id, chapter, [(keys[row], offset) for row, offset in zip(rows, offsets)])
+            with self.transaction() as conn:
+                conn.execute("UPDATE chapters SET indexed = 1 WHERE book_id = ? AND name = ?", (book_id, chapter))
+
+    def mention_counts(self, book_id):
+        return dict(self.conn.execute(
+            "SELECT character_key, COUNT(*) FROM mentions WHERE book_id = ? GROUP BY character_key", (book_id,)
+        ))
+
+
+def main():
+    store = CharacterStore()
+    books = store.list_books()
+    if not books:
+        print(f"No books in {STORE_PATH} yet")
+    for book in books:
+        print(f"{book['title']} ({book['author']}, {book['year']}): "
+              f"{book['chapters']} chapters, {book['characters']} characters")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
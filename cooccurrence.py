@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Co-occurrence Relationship Inference
+Derives weighted character interaction edges from how often characters are
+mentioned close together, without any LLM calls.
+"""
+
+import re
+import numpy as np
+from scipy import sparse
+
+# ====== CONFIGURATION ======
+SENTENCE_WINDOW = 3         # Sentences per sliding window
+PARAGRAPH_WEIGHT = 0.5      # Extra weight for sharing a paragraph
+MIN_COOCCURRENCE = 3.0      # Minimum weight for an inferred edge (about three co-mentions)
+MIN_ASSOCIATION = 0.1       # Minimum weight relative to how often each character appears
+INTERACTION_TYPE = "interacts with"
+# ===========================
+
+# Abbreviated titles whose period does not end a sentence ("Mr. Bennet").
+# Spelled-out titles (Duke, King, ...) are left out: they often do end one.
+TITLE_ABBREVIATIONS = ("Mr", "Mrs", "Ms", "Dr", "St", "Rev", "Prof", "Capt", "Col", "Gen", "Lt", "Sgt", "Mme", "Mlle")
+
+SENTENCE_END = re.compile(
+    r'(?<=[.!?])' + ''.join(r'(?<!\b%s\.)' % title for title in TITLE_ABBREVIATIONS) + r'["”\']?\s+'
+)
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+
+def character_aliases(characters):
+    """Map each character key to the strings that count as a mention of it"""
+    aliases = {}
+    for key, char in characters.items():
+        names = {key}
+        full_name = char.get('name')
+        if full_name:
+            names.add(full_name)
+        aliases[key] = sorted(names, key=len, reverse=True)
+    return aliases
+
+
+def find_mentions(text, characters):
+    """Return (character keys, (character index, text offset) arrays for every mention)"""
+    keys = list(characters)
+    aliases = character_aliases(characters)
+
+    # One alternation over all aliases, longest first, so "Mrs. Bennet" wins over "Bennet"
+    alias_owner = {}
+    for key in keys:
+        for alias in aliases[key]:
+            alias_owner.setdefault(alias, key)
+    if not alias_owner:
+        return keys, (np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+    pattern = re.compile(
+        r'(?<!\w)(' + '|'.join(re.escape(a) for a in sorted(alias_owner, key=len, reverse=True)) + r')(?!\w)'
+    )
+
+    rows, offsets = [], []
+    index = {key: i for i, key in enumerate(keys)}
+    for match in pattern.finditer(text):
+        rows.append(index[alias_owner[match.group(1)]])
+        offsets.append(match.start())
+
+    return keys, (np.array(rows, dtype=np.int64), np.array(offsets, dtype=np.int64))
+
+
+def segment_starts(text, separator):
+    """Start offsets of each segment (sentence or paragraph) in text"""
+    return np.array([0] + [m.end() for m in separator.finditer(text)], dtype=np.int64)
+
+
+def build_cooccurrence_matrix(text, characters, window=SENTENCE_WINDOW, paragraph_weight=PARAGRAPH_WEIGHT):
+    """Build a sparse, symmetric character-by-character co-occurrence matrix.
+
+    Two characters co-occur when they are mentioned within `window` consecutive
+    sentences of each other; sharing a paragraph adds `paragraph_weight`.
+    Weights are in units of co-mentions: a pair in the same sentence adds 1,
+    in adjacent sentences (window - 1) / window, and so on. The diagonal holds
+    each character's own weight (roughly the sentences mentioning it).
+    Returns (character keys, scipy.sparse.csr_matrix).
+    """
+    keys, (rows, offsets) = find_mentions(text, characters)
+    n = len(keys)
+    if len(rows) == 0:
+        return keys, sparse.csr_matrix((n, n))
+
+    # Character x sentence incidence (mention counts collapsed to presence)
+    sentence_of = np.searchsorted(segment_starts(text, SENTENCE_END), offsets, side='right') - 1
+    n_sentences = int(sentence_of.max()) + 1
+    by_sentence = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, sentence_of)), shape=(n, n_sentences)
+    )
+    by_sentence.data[:] = 1.0
+
+    # Sliding windows: sentence i belongs to windows i-window+1 .. i
+    n_windows = n_sentences + window - 1
+    sentence_idx = np.repeat(np.arange(n_sentences), window)
+    window_idx = sentence_idx + np.tile(np.arange(window), n_sentences)
+    windows = sparse.csr_matrix(
+        (np.ones(len(sentence_idx)), (sentence_idx, window_idx)), shape=(n_sentences, n_windows)
+    )
+    by_window = by_sentence @ windows
+    by_window.data[:] = 1.0
+    matrix = (by_window @ by_window.T) / window
+
+    # Paragraph co-occurrence
+    if paragraph_weight:
+        paragraph_of = np.searchsorted(segment_starts(text, PARAGRAPH_BREAK), offsets, side='right') - 1
+        by_paragraph = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, paragraph_of)), shape=(n, int(paragraph_of.max()) + 1)
+        )
+        by_paragraph.data[:] = 1.0
+        matrix = matrix + paragraph_weight * (by_paragraph @ by_paragraph.T)
+
+    return keys, sparse.csr_matrix(matrix)
+
+
+def cooccurrence_edges(keys, matrix, min_weight=MIN_COOCCURRENCE, min_association=MIN_ASSOCIATION):
+    """Weighted interaction edges (source, target, weight), strongest first.
+
+    An edge needs at least `min_weight` co-mentions, and its weight divided by
+    the geometric mean of both characters' own weights must reach
+    `min_association`, so frequent characters are not linked to everyone.
+    """
+    upper = sparse.triu(matrix, k=1).tocoo()
+    own = matrix.diagonal()
+    association = upper.data / np.sqrt(np.maximum(own[upper.row] * own[upper.col], 1e-12))
+    keep = (upper.data >= min_weight) & (association >= min_association)
+    edges = [
+        (keys[i], keys[j], float(w))
+        for i, j, w in zip(upper.row[keep], upper.col[keep], upper.data[keep])
+    ]
+    return sorted(edges, key=lambda edge: -edge[2])
+
+
+def combined_cooccurrence_matrix(characters, texts):
+    """Sum co-occurrence over several texts (excerpts/chapters)"""
+    keys = list(characters)
+    total = sparse.csr_matrix((len(keys), len(keys)))
+    for text in texts:
+        _, matrix = build_cooccurrence_matrix(text, characters)
+        total = total + matrix
+    return keys, total
+
+
+def infer_relationships(characters, texts, min_weight=MIN_COOCCURRENCE):
+    """Weighted interaction edges over several texts"""
+    keys, matrix = combined_cooccurrence_matrix(characters, texts)
+    return cooccurrence_edges(keys, matrix, min_weight)
+
+
+def add_cooccurrence_relationships(characters, texts, min_weight=MIN_COOCCURRENCE):
+    """Supplement LLM relationships with inferred interaction edges and flag
+    LLM relationships between characters that are never mentioned together.
+
+    Run after make_relationships_bidirectional: pairs already related in
+    either direction are left alone, new edges are added in both directions.
+    """
+    keys, matrix = combined_cooccurrence_matrix(characters, texts)
+    edges = cooccurrence_edges(keys, matrix, min_weight)
+    supported = {
+        frozenset((a, b)) for a, b, _ in cooccurrence_edges(keys, matrix, min_weight=1e-9, min_association=0)
+    }
+
+    def related(a, b):
+        return any(r.get('character') == b for r in characters[a].get('relationships') or [])
+
+    added = 0
+    for source, target, weight in edges:
+        if related(source, target) or related(target, source):
+            continue
+        for a, b in ((source, target), (target, source)):
+            characters[a].setdefault('relationships', []).append({'character': b, 'type': INTERACTION_TYPE})
+            added += 1
+
+    unsupported = sorted({
+        tuple(sorted((key, rel.get('character'))))
+        for key, char in characters.items()
+        for rel in char.get('relationships') or []
+        if rel.get('character') in characters
+        and rel.get('character') != key
+        and frozenset((key, rel.get('character'))) not in supported
+    })
+
+    print(f"[OK] Co-occurrence: {len(edges)} edges, {added} relationships added")
+    if unsupported:
+        print(f"[WARN] {len(unsupported)} relationships have no co-occurrence support:")
+        for a, b in unsupported:
+            print(f"  - {a} / {b}")
+
+    return characters
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Extraction Evaluation Harness
+Runs each character-extraction mode over a fixed corpus and scores it against
+a gold character set, printing wall time, tokens and quality per mode.
+
+By default the corpus and hand-curated gold set come from a frozen fixture
+(fixtures/evaluation_corpus.json), and requests go to a deterministic local
+stand-in for the LLM, so no API calls are made. The stand-in knows the gold
+cast but only reports what each prompt shows it, so truncation, chunking and
+prefiltering change its answers. Its reported times are modeled API latency
+(per-request overhead plus prompt and completion token throughput), not local
+compute. Recorded responses from the real API can be captured once and
+replayed afterwards; ranking replayed modes by time needs --replay-latency.
+
+Usage:
+    python evaluate_extraction.py                                  # local stand-in
+    python evaluate_extraction.py --record evaluation_responses.json   # real API, saves responses
+    python evaluate_extraction.py --replay evaluation_responses.json   # replay saved responses
+    python evaluate_extraction.py --min-f1 0.8                     # pick fastest mode meeting the bar
+    python evaluate_extraction.py --corpus a.ts --gold b.ts        # bookData.ts-format corpus and gold set
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from types import SimpleNamespace
+import numpy as np
+from openai import OpenAI
+
+import rate_limiter
+from cooccurrence import build_cooccurrence_matrix, find_mentions
+from extract_characters import (
+    load_api_key, merge_characters, extract_characters_with_llm,
+    extract_characters_from_bookdata, extract_excerpts_from_bookdata
+)
+from prefilter import OMITTED_MARKER, build_prefiltered_prompt_text, estimate_tokens
+
+# ====== CONFIGURATION ======
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "evaluation_corpus.json")
+CHUNK_CHARS = 3000      # Chunk size for the chunked mode (matches the baseline truncation)
+MODES = ["baseline", "chunked", "packed", "prefiltered", "cached"]
+STAND_IN_MISS_RATE = 0.15           # Chance of missing a character mentioned once in a short prompt
+STAND_IN_HALLUCINATION_RATE = 0.2   # Share of requests that report a made-up character
+LONG_PROMPT_TOKENS = 2000           # Miss rate doubles every this many prompt tokens
+# Modeled API latency per request, used as the stand-in's time
+STAND_IN_BASE_LATENCY = 0.5         # Seconds per request
+STAND_IN_PROMPT_TOKENS_PER_SECOND = 5000
+STAND_IN_COMPLETION_TOKENS_PER_SECOND = 60
+STAND_IN_TIME_SCALE = 0.01          # The stand-in sleeps this fraction of the modeled latency
+# ===========================
+
+
+# ---------- clients ----------
+
+def make_response(content, prompt_tokens, completion_tokens):
+    """Build an object shaped like an OpenAI chat completion"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
+    )
+
+
+def request_key(kwargs):
+    """Stable hash of a chat request"""
+    return hashlib.sha256(json.dumps(kwargs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class MeteredClient:
+    """Presents the chat.completions.with_raw_response.create interface used by
+    create_chat_completion() and counts requests and tokens"""
+
+    def __init__(self, create):
+        self._create = create
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=self))
+        self._lock = threading.Lock()  # Modes may run requests concurrently
+
+    def create(self, **kwargs):
+        response, headers = self._create(**kwargs)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += response.usage.prompt_tokens
+            self.completion_tokens += response.usage.completion_tokens
+        return SimpleNamespace(headers=headers, parse=lambda: response)
+
+
+class StandInLLM:
+    """Deterministic local stand-in that knows the gold cast but only reports
+    what the prompt text shows it, with controlled noise: a character is missed
+    with probability miss_rate / mentions (higher for long prompts), a gold
+    relationship needs both characters within a sentence window, and a
+    character is made up in hallucination_rate of requests.
+
+    Only the text to analyze is read: for prefiltered prompts that is the
+    passages, each scored separately, not the candidate list. Each request
+    sleeps time_scale times its modeled latency; modeled_seconds() scales those
+    waits back up, so concurrent requests overlap as they would against the API."""
+
+    def __init__(self, gold, miss_rate=STAND_IN_MISS_RATE, hallucination_rate=STAND_IN_HALLUCINATION_RATE,
+                 time_scale=STAND_IN_TIME_SCALE):
+        self.gold = gold
+        self.miss_rate = miss_rate
+        self.hallucination_rate = hallucination_rate
+        self.time_scale = time_scale
+        self._waits = []
+        self._lock = threading.Lock()  # Modes may run requests concurrently
+
+    def modeled_seconds(self, start, end):
+        """Wall time between start and end, with the time spent waiting on any request scaled to API latency"""
+        with self._lock:
+            waits = sorted((max(a, start), min(b, end)) for a, b in self._waits if b > start and a < end)
+        waiting, covered = 0.0, start
+        for a, b in waits:
+            if b > covered:
+                waiting += b - max(a, covered)
+                covered = b
+        return (end - start) - waiting + waiting / self.time_scale
+
+    def _chance(self, *parts):
+        """Deterministic pseudo-random number in [0, 1) for these inputs"""
+        digest = hashlib.sha256("\x00".join(parts).encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+    def __call__(self, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        text = prompt.split("Text:\n", 1)[-1]
+        if text.startswith("Candidate names found"):
+            # Prefiltered prompt: drop the candidate list, keep the passages
+            text = text.split("Relevant passages", 1)[1].split(":\n", 1)[-1]
+        # Omitted text separates passages, so they must not share a sentence window
+        passages = [passage for passage in text.split(OMITTED_MARKER) if passage.strip()]
+        length_factor = 1 + estimate_tokens(text) / LONG_PROMPT_TOKENS
+
+        keys = list(self.gold)
+        mentions = np.zeros(len(keys), dtype=np.int64)
+        matrix = None
+        for passage in passages:
+            _, (rows, _) = find_mentions(passage, self.gold)
+            mentions += np.bincount(rows, minlength=len(keys))
+            _, passage_matrix = build_cooccurrence_matrix(passage, self.gold, paragraph_weight=0)
+            matrix = passage_matrix if matrix is None else matrix + passage_matrix
+        found = [
+            key for key, count in zip(keys, mentions)
+            if count and self._chance(text, key) >= self.miss_rate * length_factor / count
+        ]
+
+        index = {key: i for i, key in enumerate(keys)}
+        characters = {}
+        for key in found:
+            gold_char = self.gold[key]
+            characters[key] = {
+                "name": gold_char.get("name", key),
+                "description": gold_char.get("description", "A character in the story."),
+                "role": gold_char.get("role", "Supporting Character"),
+                "appearances": int(mentions[index[key]]),
+                "relationships": [
+                    rel for rel in gold_char.get("relationships") or []
+                    if rel["character"] in found and matrix[index[key], index[rel["character"]]] > 0
+                ]
+            }
+        if self._chance(text, "hallucination") < self.hallucination_rate:
+            characters["The Stranger"] = {
+                "name": "The Stranger",
+                "description": "A figure mentioned in passing.",
+                "role": "Minor Character",
+                "appearances": 1
+            }
+
+        content = json.dumps(characters)
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        latency = (STAND_IN_BASE_LATENCY
+                   + prompt_tokens / STAND_IN_PROMPT_TOKENS_PER_SECOND
+                   + completion_tokens / STAND_IN_COMPLETION_TOKENS_PER_SECOND)
+        start = time.time()
+        time.sleep(latency * self.time_scale)
+        with self._lock:
+            self._waits.append((start, time.time()))
+        return make_response(content, prompt_tokens, completion_tokens), {}
+
+
+class RecordedLLM:
+    """Replays responses saved from the real API, or records them when given a client"""
+
+    def __init__(self, path, client=None, replay_latency=False):
+        self.path = path
+        self.client = client
+        self.replay_latency = replay_latency
+        self.recordings = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.recordings = json.load(f)
+
+    def __call__(self, **kwargs):
+        key = request_key(kwargs)
+        if self.client is not None and key not in self.recordings:
+            start = time.time()
+            raw = self.client.chat.completions.with_raw_response.create(**kwargs)
+            response = raw.parse()
+            with self._lock:
+                self.recordings[key] = {
+                    "content": response.choices[0].message.content,
+                    "prompt_tokens": response.usage.prompt_tokens,
+                    "completion_tokens": response.usage.completion_tokens,
+                    "latency": time.time() - start
+                }
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    json.dump(self.recordings, f, indent=2)
+            return response, raw.headers
+
+        if key not in self.recordings:
+            raise KeyError(f"No recorded response for this request in {self.path}; run with --record first")
+        recording = self.recordings[key]
+        if self.replay_latency:
+            time.sleep(recording["latency"])
+        return make_response(recording["content"], recording["prompt_tokens"], recording["completion_tokens"]), {}
+
+
+class CachedLLM:
+    """In-memory response cache in front of another LLM callable"""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.cache = {}
+
+    def __call__(self, **kwargs):
+        key = request_key(kwargs)
+        if key not in self.cache:
+            self.cache[key] = self.llm(**kwargs)
+        response, headers = self.cache[key]
+        # Cache hits cost no tokens
+        return make_response(response.choices[0].message.content, 0, 0), headers
+
+
+# ---------- extraction modes ----------
+
+def chunk_text(text, size=CHUNK_CHARS):
+    """Split text on paragraph boundaries into chunks of at most ~size characters"""
+    chunks, current = [], ""
+    for paragraph in text.split("\n\n"):
+        if current and len(current) + len(paragraph) + 2 > size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def run_baseline(client, excerpts):
+    """What extract_characters.main does: one request per excerpt, first 3000 chars"""
+    all_characters = {}
+    for name, text in excerpts.items():
+        all_characters = merge_characters(all_characters, extract_characters_with_llm(client, text, name))
+    return all_characters
+
+
+def run_chunked(client, excerpts):
+    """One request per CHUNK_CHARS chunk, so the whole excerpt is covered; chunks
+    run concurrently as far as the rate limits allow"""
+    chunks = [
+        (f"{name}#{idx}", chunk)
+        for name, text in excerpts.items()
+        for idx, chunk in enumerate(chunk_text(text), 1)
+    ]
+    results = rate_limiter.map_concurrently(
+        lambda item: extract_characters_with_llm(client, item[1], item[0], max_chars=None),
+        chunks,
+        rate_limiter.estimate_tokens([{"content": "x" * CHUNK_CHARS}])
+    )
+    all_characters = {}
+    for chars in results:
+        all_characters = merge_characters(all_characters, chars)
+    return all_characters
+
+
+def run_packed(client, excerpts):
+    """All excerpts in a single request"""
+    packed = "\n\n".join(f"[{name}]\n{text}" for name, text in excerpts.items())
+    return extract_characters_with_llm(client, packed, "packed", max_chars=None)
+
+
+def run_prefiltered(client, excerpts):
+    """One request per excerpt carrying only the sentences around candidate names"""
+    all_characters = {}
+    for name, text in excerpts.items():
+        chars = extract_characters_with_llm(client, build_prefiltered_prompt_text(text), name, max_chars=None)
+        all_characters = merge_characters(all_characters, chars)
+    return all_characters
+
+
+# ---------- scoring ----------
+
+def normalize(name):
+    return " ".join(str(name).lower().replace(".", "").split())
+
+
+def relationship_pairs(characters, resolve):
+    """Undirected pairs of related characters (relationship type is not scored)"""
+    pairs = set()
+    for key, char in characters.items():
+        for rel in char.get('relationships') or []:
+            source, target = resolve(key), resolve(rel.get('character', ''))
+            if source != target:
+                pairs.add(frozenset((source, target)))
+    return pairs
+
+
+def precision_recall(predicted, gold):
+    true_positives = len(predicted & gold)
+    precision = true_positives / len(predicted) if predicted else 0.0
+    recall = true_positives / len(gold) if gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def score(characters, gold):
+    """Character and relationship (precision, recall, F1) against the gold set.
+    Predicted names match a gold character by its key or full name."""
+    gold_names = {}
+    for key, char in gold.items():
+        gold_names[normalize(key)] = key
+        gold_names[normalize(char.get('name', key))] = key
+
+    def resolve(name, char=None):
+        for candidate in (name, (char or {}).get('name', name)):
+            if normalize(candidate) in gold_names:
+                return gold_names[normalize(candidate)]
+        return f"?{normalize(name)}"  # Unmatched: counts as a false positive
+
+    key_map = {key: resolve(key, char) for key, char in characters.items()}
+
+    return {
+        "characters": precision_recall(set(key_map.values()), set(gold)),
+        "relationships": precision_recall(
+            relationship_pairs(characters, lambda name: key_map.get(name) or resolve(name)),
+            relationship_pairs(gold, lambda name: name)
+        ),
+    }
+
+
+# ---------- harness ----------
+
+def evaluate(llm, excerpts, gold, modes):
+    results = []
+    for mode in modes:
+        print(f"\n--- {mode} ---")
+        if mode == "cached":
+            cached = CachedLLM(llm)
+            run_baseline(MeteredClient(cached), excerpts)  # Warm the cache
+            client, runner = MeteredClient(cached), run_baseline
+        else:
+            client, runner = MeteredClient(llm), globals()[f"run_{mode}"]
+
+        start = time.time()
+        characters = runner(client, excerpts)
+        elapsed = time.time() - start
+
+        results.append({
+            "mode": mode,
+            "seconds": llm.modeled_seconds(start, start + elapsed) if isinstance(llm, StandInLLM) else elapsed,
+            "requests": client.requests,
+            "prompt_tokens": client.prompt_tokens,
+            "completion_tokens": client.completion_tokens,
+            **score(characters, gold)
+        })
+    return results
+
+
+def print_table(results):
+    header = f"{'Mode':<12} {'Time (s)':>9} {'Reqs':>5} {'Prompt tok':>11} {'Compl tok':>10}   " \
+             f"{'Char P/R/F1':<17} {'Rel P/R/F1':<17}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        char_scores = "/".join(f"{v:.2f}" for v in r["characters"])
+        rel_scores = "/".join(f"{v:.2f}" for v in r["relationships"])
+        print(f"{r['mode']:<12} {r['seconds']:>9.2f} {r['requests']:>5} {r['prompt_tokens']:>11,} "
+              f"{r['completion_tokens']:>10,}   {char_scores:<17} {rel_scores:<17}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare extraction modes for speed and quality")
+    parser.add_argument("--fixture", default=FIXTURE_PATH,
+                        help="JSON file with frozen excerpts and a curated gold set")
+    parser.add_argument("--corpus", help="bookData.ts-format file providing the excerpts (needs --gold)")
+    parser.add_argument("--gold", help="bookData.ts-format file providing the gold characters (needs --corpus)")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"comma-separated subset of {','.join(MODES)}")
+    parser.add_argument("--record", metavar="FILE", help="call the real API and save responses to FILE")
+    parser.add_argument("--replay", metavar="FILE", help="replay responses saved with --record")
+    parser.add_argument("--replay-latency", action="store_true", help="sleep for each recorded API latency")
+    parser.add_argument("--min-f1", type=float, help="report the fastest mode whose character F1 meets this")
+    args = parser.parse_args()
+
+    if args.min_f1 is not None and args.replay and not args.replay_latency:
+        # Replayed responses return instantly, so their times say nothing about the API
+        parser.error("--min-f1 with --replay needs --replay-latency to rank modes by time")
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+
+    if bool(args.corpus) != bool(args.gold):
+        parser.error("--corpus and --gold must be given together")
+    if args.corpus:
+        excerpts = extract_excerpts_from_bookdata(args.corpus)
+        gold = extract_characters_from_bookdata(args.gold)
+    else:
+        with open(args.fixture, 'r', encoding='utf-8') as f:
+            fixture = json.load(f)
+        excerpts, gold = fixture["excerpts"], fixture["gold"]
+    print(f"[OK] Corpus: {len(excerpts)} excerpts, gold set: {len(gold)} characters")
+
+    if args.record:
+        llm = RecordedLLM(args.record, client=OpenAI(api_key=load_api_key()))
+        print(f"[OK] Recording real API responses to {args.record}")
+    else:
+        # Offline runs must not draw down the shared API rate-limit budget
+        state_dir = tempfile.mkdtemp()
+        rate_limiter.set_rate_limiter(rate_limiter.RateLimiter(
+            state_file=os.path.join(state_dir, "ratelimit.json"),
+            lock_file=os.path.join(state_dir, "ratelimit.lock"),
+            requests_per_minute=10 ** 9,
+            tokens_per_minute=10 ** 12
+        ))
+        if args.replay:
+            llm = RecordedLLM(args.replay, replay_latency=args.replay_latency)
+            print(f"[OK] Replaying recorded responses from {args.replay}")
+        else:
+            llm = StandInLLM(gold)
+            print("[OK] Using the local stand-in LLM (no API calls, modeled API latency)")
+
+    results = evaluate(llm, excerpts, gold, modes)
+    print_table(results)
+
+    if args.min_f1 is not None:
+        passing = [r for r in results if r["characters"][2] >= args.min_f1]
+        if passing:
+            best = min(passing, key=lambda r: r["seconds"])
+            print(f"\nFastest mode with character F1 >= {args.min_f1}: {best['mode']} ({best['seconds']:.2f}s)")
+        else:
+            print(f"\nNo mode reached character F1 >= {args.min_f1}")
+
+
+if __name__ == "__main__":
+    main()
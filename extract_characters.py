@@ -5,13 +5,16 @@ Automatically extracts characters from text excerpts in bookData.ts
 """
 
 import os
+import sys
 import json
 import re
 from openai import OpenAI
+from rate_limiter import create_chat_completion, estimate_tokens, map_concurrently
+from character_store import CharacterStore
+from cooccurrence import add_cooccurrence_relationships
+from network_layout import compute_excerpt_layouts, generate_typescript_layouts, update_bookdata_layouts
 
 # ====== CONFIGURATION ======
-# Read API key from environment variable or .openai_key file
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY') or open('.openai_key', 'r').read().strip()
 BOOK_DATA_PATH = "src/app/data/bookData.ts"
 # ===========================
 
@@ -35,8 +38,121 @@ def extract_excerpts_from_bookdata(file_path):
     return excerpts
 
 
-def extract_characters_with_llm(client, text, excerpt_name):
-    """Use LLM to extract characters from text"""
+JS_STRING = re.compile(r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'')
+
+
+def parse_js_string(literal):
+    """Value of a single- or double-quoted JavaScript string literal"""
+    if literal.startswith("'"):
+        inner = re.sub(r'\\(.)|"', lambda m: "\\\"" if m.group(0) == '"' else
+                       (m.group(1) if m.group(1) == "'" else m.group(0)), literal[1:-1])
+        literal = f'"{inner}"'
+    return json.loads(literal)
+
+
+def matching_brace(skeleton, start):
+    """Index of the brace closing the one at start (string literals already removed)"""
+    depth = 0
+    for i in range(start, len(skeleton)):
+        if skeleton[i] == '{':
+            depth += 1
+        elif skeleton[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("unbalanced braces")
+
+
+def extract_characters_from_bookdata(file_path):
+    """Read the character definitions back out of bookData.ts.
+
+    Accepts single- or double-quoted values (hand edits included) and raises
+    ValueError for entries it cannot read, rather than silently dropping them.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    # Replace string literals with @n@ placeholders so quotes and braces inside
+    # descriptions can't confuse the structure
+    strings = []
+
+    def hide(match):
+        strings.append(parse_js_string(match.group(0)))
+        return f"@{len(strings) - 1}@"
+
+    characters = {}
+    declaration = re.search(r'export const characters\s*(?::[^=]*)?=\s*\{', content)
+    if not declaration:
+        return characters
+    skeleton = JS_STRING.sub(hide, content[declaration.end() - 1:])
+    block = skeleton[1:matching_brace(skeleton, 0)]
+
+    def error(message):
+        return ValueError(f"{file_path}: cannot read characters block: {message}")
+
+    def field(body, name, key):
+        if not re.search(r'(?<![\w$@])%s\s*:' % name, body):
+            return None
+        value = re.search(r'(?<![\w$@])%s\s*:\s*@(\d+)@' % name, body)
+        if not value:
+            raise error(f"'{key}' has a {name} that is not a string literal")
+        return strings[int(value.group(1))]
+
+    entry_start = re.compile(r'\s*(?:@(\d+)@|([A-Za-z_$][\w$]*))\s*:\s*\{')
+    pos = 0
+    while True:
+        while pos < len(block) and (block[pos].isspace() or block[pos] == ','):
+            pos += 1
+        if block.startswith('//', pos):
+            line_end = block.find('\n', pos)
+            pos = line_end if line_end != -1 else len(block)
+            continue
+        if pos >= len(block):
+            break
+        match = entry_start.match(block, pos)
+        if not match:
+            raise error(f"unexpected text near {block[pos:pos + 40]!r}")
+        key = strings[int(match.group(1))] if match.group(1) else match.group(2)
+        end = matching_brace(block, match.end() - 1)
+        body = block[match.end():end]
+        pos = end + 1
+
+        char = {}
+        for name in ('name', 'description', 'role'):
+            value = field(body, name, key)
+            if value is not None:
+                char[name] = value
+        if 'name' not in char:
+            raise error(f"'{key}' has no name")
+        appearances = re.search(r'(?<![\w$@])appearances\s*:\s*(\d+)', body)
+        char['appearances'] = int(appearances.group(1)) if appearances else 1
+
+        relationships = re.search(r'(?<![\w$@])relationships\s*:\s*\[([^\]]*)\]', body)
+        if relationships:
+            char['relationships'] = []
+            for rel in re.finditer(r'\{([^{}]*)\}', relationships.group(1)):
+                target, rel_type = field(rel.group(1), 'character', key), field(rel.group(1), 'type', key)
+                if target is None or rel_type is None:
+                    raise error(f"'{key}' has a relationship without character and type")
+                char['relationships'].append({'character': target, 'type': rel_type})
+            if not char['relationships']:
+                del char['relationships']
+        characters[key] = char
+
+    return characters
+
+
+def extract_book_title_from_bookdata(file_path):
+    """Read bookMetadata.title from bookData.ts"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    match = re.search(r'bookMetadata = \{.*?"?title"?: ([\'"])(.*?)\1', content, re.DOTALL)
+    return match.group(2) if match else "Untitled"
+
+
+def extract_characters_with_llm(client, text, excerpt_name, max_chars=3000):
+    """Use LLM to extract characters from text (first max_chars characters; None for all)"""
     print(f"\n[{excerpt_name}] Extracting characters with AI...")
 
     prompt = f"""Analyze this literary excerpt and extract ALL named characters AND their relationships.
@@ -66,9 +182,10 @@ IMPORTANT: Only include characters that are actually NAMED in this text. Do not
 Return ONLY valid JSON, no markdown or explanation.
 
 Text:
-{text[:3000]}"""  # Limit to first 3000 chars to avoid token limits
+{text[:max_chars]}"""  # Limit to first 3000 chars by default to avoid token limits
 
-    response = client.chat.completions.create(
+    response = create_chat_completion(
+        client,
         model="gpt-4o-mini",
         messages=[
             {
@@ -226,13 +343,68 @@ def update_bookdata_file(file_path, new_characters_code):
     print(f"\n[OK] Updated {file_path}")
 
 
+def load_api_key():
+    """Read API key from environment variable or .openai_key file"""
+    return os.getenv('OPENAI_API_KEY') or open('.openai_key', 'r').read().strip()
+
+
+def update_network_layouts(characters, excerpts):
+    """Recompute the network view node positions for every excerpt"""
+    print("Computing network layouts...")
+    layouts = compute_excerpt_layouts(characters, excerpts)
+    update_bookdata_layouts(BOOK_DATA_PATH, generate_typescript_layouts(layouts))
+
+
+def layout_only():
+    """Recompute network layouts from the characters already in bookData.ts (no API calls)"""
+    print(f"Reading characters and excerpts from {BOOK_DATA_PATH}...")
+    characters = extract_characters_from_bookdata(BOOK_DATA_PATH)
+    excerpts = extract_excerpts_from_bookdata(BOOK_DATA_PATH)
+    print(f"[OK] Found {len(characters)} characters in {len(excerpts)} excerpts\n")
+    update_network_layouts(characters, excerpts)
+
+
+def write_characters(all_characters, excerpts):
+    """Post-process merged LLM characters and write them (and layouts) to bookData.ts"""
+    # Make relationships bidirectional (so network graphs work properly)
+    print("Making relationships bidirectional...")
+    all_characters = make_relationships_bidirectional(all_characters)
+    print("[OK] Relationships are now bidirectional\n")
+
+    # Supplement/validate LLM relationships with local co-occurrence over the full excerpts
+    print("Inferring interactions from co-occurrence...")
+    all_characters = add_cooccurrence_relationships(all_characters, excerpts.values())
+    print()
+
+    # Store the excerpts, characters and mentions, then export from the store
+    store = CharacterStore()
+    book_id = store.book_id(extract_book_title_from_bookdata(BOOK_DATA_PATH))
+    store.upsert_chapters(
+        book_id, [{"chapter": name, "text": text} for name, text in excerpts.items()], prune=True
+    )
+    store.upsert_characters(book_id, all_characters, prune=True)
+    store.index_mentions(book_id)
+
+    # Generate TypeScript code
+    ts_code = generate_typescript_characters(store.load_characters(book_id))
+    store.close()
+
+    # Update bookData.ts
+    update_bookdata_file(BOOK_DATA_PATH, ts_code)
+
+    # Precompute network view positions for the new character set
+    update_network_layouts(all_characters, excerpts)
+
+    return all_characters
+
+
 def main():
     print("=" * 60)
     print("  Character Extraction Tool")
     print("=" * 60)
 
     # Setup OpenAI
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    client = OpenAI(api_key=load_api_key())
     print("[OK] OpenAI API configured\n")
 
     # Extract excerpts from bookData.ts
@@ -240,25 +412,20 @@ def main():
     excerpts = extract_excerpts_from_bookdata(BOOK_DATA_PATH)
     print(f"[OK] Found {len(excerpts)} excerpts: {', '.join(excerpts.keys())}\n")
 
-    # Extract characters from each excerpt
+    # Extract characters from each excerpt (concurrently, as far as the rate limits allow)
+    results = map_concurrently(
+        lambda item: extract_characters_with_llm(client, item[1], item[0]),
+        excerpts.items(),
+        max(estimate_tokens([{"content": text[:3000]}]) for text in excerpts.values()) if excerpts else 1
+    )
     all_characters = {}
-    for excerpt_name, text in excerpts.items():
-        chars = extract_characters_with_llm(client, text, excerpt_name)
+    for chars in results:
         all_characters = merge_characters(all_characters, chars)
 
     print(f"\n[OK] Total unique characters across all excerpts: {len(all_characters)}")
     print(f"Characters: {', '.join(all_characters.keys())}\n")
 
-    # Make relationships bidirectional (so network graphs work properly)
-    print("Making relationships bidirectional...")
-    all_characters = make_relationships_bidirectional(all_characters)
-    print("[OK] Relationships are now bidirectional\n")
-
-    # Generate TypeScript code
-    ts_code = generate_typescript_characters(all_characters)
-
-    # Update bookData.ts
-    update_bookdata_file(BOOK_DATA_PATH, ts_code)
+    all_characters = write_characters(all_characters, excerpts)
 
     print("\n" + "=" * 60)
     print("  DONE!")
@@ -271,4 +438,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if '--layout-only' in sys.argv:
+        layout_only()
+    else:
+        main()
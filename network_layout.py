@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Network Layout Generator
+Computes force-directed node positions for the relationship network view,
+so NetworkReader.tsx doesn't need a hand-maintained position table.
+"""
+
+import json
+import re
+import numpy as np
+
+# ====== CONFIGURATION ======
+# Canvas size used by the network popup in NetworkReader.tsx
+LAYOUT_WIDTH = 800
+LAYOUT_HEIGHT = 600
+LAYOUT_MARGIN = 80
+LAYOUT_ITERATIONS = 300
+LAYOUT_SEED = 42
+# ===========================
+
+
+def compute_force_layout(nodes, edges, weights=None, width=LAYOUT_WIDTH, height=LAYOUT_HEIGHT,
+                         iterations=LAYOUT_ITERATIONS, seed=LAYOUT_SEED):
+    """Fruchterman-Reingold layout computed with NumPy over the whole graph at once.
+
+    nodes: list of node names
+    edges: list of (source, target, weight) tuples
+    weights: optional {name: appearances}; frequent characters repel harder and
+             are pulled towards the centre of the canvas
+    Returns {name: {"x": int, "y": int}} in canvas coordinates.
+    """
+    n = len(nodes)
+    if n == 0:
+        return {}
+    if n == 1:
+        return {nodes[0]: {"x": width // 2, "y": height // 2}}
+
+    index = {name: i for i, name in enumerate(nodes)}
+
+    # Symmetric weighted adjacency matrix
+    adjacency = np.zeros((n, n))
+    for source, target, weight in edges:
+        if source not in index or target not in index or source == target:
+            continue
+        i, j = index[source], index[target]
+        adjacency[i, j] += weight
+        adjacency[j, i] += weight
+    if adjacency.max() > 0:
+        adjacency /= adjacency.max()
+
+    # Node mass from appearances, normalised so the average node weighs 1
+    mass = np.ones(n)
+    if weights:
+        mass = np.array([max(float(weights.get(name, 1)), 1.0) for name in nodes])
+        mass = np.sqrt(mass)
+        mass /= mass.mean()
+
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-0.5, 0.5, size=(n, 2)) * np.array([width, height])
+
+    k = np.sqrt(width * height / n)  # ideal edge length
+    temperature = width / 10
+    cooling = temperature / (iterations + 1)
+    gravity = 0.3
+
+    for _ in range(iterations):
+        delta = pos[:, np.newaxis, :] - pos[np.newaxis, :, :]
+        distance = np.linalg.norm(delta, axis=-1)
+        np.fill_diagonal(distance, 1.0)
+        distance = np.maximum(distance, 0.01)
+
+        repulsive = (k * k / distance) * np.outer(mass, mass)
+        np.fill_diagonal(repulsive, 0.0)
+        attractive = adjacency * distance * distance / k
+
+        force = (repulsive - attractive) / distance
+        displacement = np.einsum('ij,ijk->ik', force, delta)
+
+        # Gravity keeps disconnected components on the canvas
+        displacement -= gravity * pos * mass[:, np.newaxis]
+
+        length = np.maximum(np.linalg.norm(displacement, axis=1, keepdims=True), 0.01)
+        pos += displacement / length * np.minimum(length, temperature)
+        temperature -= cooling
+
+    # Scale into the canvas, preserving aspect ratio
+    pos -= pos.mean(axis=0)
+    extent = np.abs(pos).max(axis=0)
+    extent[extent == 0] = 1.0
+    half = np.array([width / 2 - LAYOUT_MARGIN, height / 2 - LAYOUT_MARGIN])
+    pos = pos * (half / extent).min() + np.array([width / 2, height / 2])
+
+    return {
+        name: {"x": int(round(pos[i, 0])), "y": int(round(pos[i, 1]))}
+        for name, i in index.items()
+    }
+
+
+def compute_excerpt_layouts(characters, excerpts):
+    """Compute one layout per excerpt over the characters named in its text"""
+    layouts = {}
+
+    for excerpt_name, text in excerpts.items():
+        # Same exact-match rule the readers use to highlight names
+        appearances = {key: text.count(key) for key in characters if key in text}
+        nodes = sorted(appearances, key=lambda key: (-appearances[key], key))
+
+        edges = {}
+        for key in nodes:
+            for rel in characters[key].get('relationships') or []:
+                target = rel.get('character')
+                if target not in appearances or target == key:
+                    continue
+                pair = tuple(sorted((key, target)))
+                edges[pair] = np.sqrt(appearances[key] * appearances[target])
+
+        layouts[excerpt_name] = compute_force_layout(
+            nodes,
+            [(a, b, w) for (a, b), w in edges.items()],
+            weights=appearances
+        )
+        print(f"[{excerpt_name}] Laid out {len(nodes)} characters, {len(edges)} edges")
+
+    return layouts
+
+
+def generate_typescript_layouts(layouts):
+    """Generate TypeScript code for per-excerpt node positions"""
+    ts_layouts = "export const nodeLayouts: Record<string, Record<string, { x: number; y: number }>> = {\n"
+
+    for excerpt_name, positions in layouts.items():
+        ts_layouts += f"  {excerpt_name}: {{\n"
+        for key, point in positions.items():
+            ts_layouts += f"    {json.dumps(key)}: {{ x: {point['x']}, y: {point['y']} }},\n"
+        ts_layouts += "  },\n"
+
+    ts_layouts += "};\n"
+    return ts_layouts
+
+
+def update_bookdata_layouts(file_path, new_layouts_code):
+    """Replace (or insert after the characters) the nodeLayouts block in bookData.ts"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    layouts_pattern = r'export const nodeLayouts: .*? = \{.*?\n\};'
+    if re.search(layouts_pattern, content, flags=re.DOTALL):
+        updated_content = re.sub(layouts_pattern, lambda match: new_layouts_code.strip(), content, flags=re.DOTALL)
+    else:
+        block = (
+            "\n\n// ============================================\n"
+            "// NETWORK LAYOUT (generated by network_layout.py)\n"
+            "// ============================================\n"
+            + new_layouts_code.strip()
+        )
+        characters_pattern = r'export const characters: Record<string, Character> = \{.*?\};'
+        updated_content = re.sub(characters_pattern, lambda match: match.group(0) + block, content,
+                                 count=1, flags=re.DOTALL)
+
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(updated_content)
+
+    print(f"[OK] Updated network layouts in {file_path}")
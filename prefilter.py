@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Candidate-Name Prefilter
+Finds likely character names locally (capitalization and title heuristics plus
+names known from previous runs) and condenses a text to the sentences around
+them, so extraction prompts only carry the parts that mention characters.
+"""
+
+import re
+import numpy as np
+from cooccurrence import SENTENCE_END, TITLE_ABBREVIATIONS, segment_starts
+
+# ====== CONFIGURATION ======
+CONTEXT_SENTENCES = 1   # Sentences kept before and after each candidate mention
+MIN_SENTENCE_INITIAL = 2  # Lone capitalized words only seen opening sentences need this many uses
+OMITTED_MARKER = "[...]"
+# ===========================
+
+TITLES = (
+    "Mr", "Mrs", "Ms", "Miss", "Dr", "Sir", "Lady", "Lord", "Madame", "Monsieur",
+    "Mademoiselle", "Captain", "Colonel", "General", "Duke", "Duchess", "Prince",
+    "Princess", "King", "Queen", "Cardinal", "Count", "Countess", "Earl", "Father",
+    "Aunt", "Uncle",
+) + tuple(t for t in TITLE_ABBREVIATIONS if t not in ("Mr", "Mrs", "Ms", "Dr"))
+PARTICLES = ("de", "du", "des", "la", "le", "von", "van", "of", "d'")
+
+# Capitalized words that are almost never names on their own
+COMMON_WORDS = {
+    "A", "An", "The", "And", "But", "Or", "Nor", "So", "Yet", "For", "If", "When", "While",
+    "Then", "Than", "That", "This", "These", "Those", "There", "Here", "Where", "What",
+    "Which", "Who", "Whom", "Whose", "Why", "How", "I", "I'm", "I'll", "I've", "I'd", "It",
+    "Its", "It's", "He", "She", "We", "They", "You", "Me", "Him", "Her", "His", "Hers",
+    "Us", "Them", "My", "Our", "Your", "Their", "Yes", "No", "Not", "Oh", "Ah", "Well",
+    "As", "At", "By", "In", "On", "Of", "To", "With", "From", "Into", "After", "Before",
+    "Now", "Some", "All", "Every", "Each", "One", "Do", "Did", "Does", "Is", "Was", "Are",
+    "Were", "Be", "Been", "Have", "Has", "Had", "Let", "Chapter", "Perhaps", "Indeed",
+    "Nothing", "Everything", "Nobody", "Everybody", "Such", "Very", "Only", "Even", "Still",
+    "Both", "Neither", "Either", "Down", "Up", "Out", "Off", "Over", "Come", "Go", "Look",
+    "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday",
+    "January", "February", "March", "April", "May", "June", "July", "August",
+    "September", "October", "November", "December", "God", "Heaven",
+}
+
+_CAP_WORD = r"[^\W\d_a-z](?:[\w'’-]*\w)?"
+NAME_PATTERN = re.compile(
+    r"(?<![\w.])"
+    r"(?:(?P<title>" + "|".join(TITLES) + r")\.?\s+)?"
+    # A following title starts a new name: "Then Dr. Whitlock" -> "Then", "Dr. Whitlock"
+    r"(?P<name>" + _CAP_WORD + r"(?:\s+(?!(?:" + "|".join(TITLES) + r")\.?\s)(?:(?:"
+    + "|".join(PARTICLES) + r")\s+)?" + _CAP_WORD + r")*)"
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token)"""
+    return len(text) // 4
+
+
+def known_names_from(characters):
+    """Character keys and full names from an extraction result"""
+    names = set()
+    for key, char in (characters or {}).items():
+        names.add(key)
+        if char.get('name'):
+            names.add(char['name'])
+    return names
+
+
+def find_candidates(text, known_names=()):
+    """Return {candidate name: [offsets]} for likely character mentions"""
+    known = {name for name in known_names if name}
+    sentence_starts = set(segment_starts(text, SENTENCE_END).tolist())
+    candidates = {}
+    sentence_initial = {}
+
+    # Names from previous runs are always candidates
+    if known:
+        known_pattern = re.compile(
+            r"(?<!\w)(" + "|".join(re.escape(n) for n in sorted(known, key=len, reverse=True)) + r")(?!\w)"
+        )
+        for match in known_pattern.finditer(text):
+            candidates.setdefault(match.group(1), []).append(match.start())
+
+    for match in NAME_PATTERN.finditer(text):
+        if match.group("title"):
+            name, start = match.group(0), match.start()
+        else:
+            # "The Duke" -> "Duke"; "Then" -> nothing
+            words = match.group("name").split()
+            while words and words[0] in COMMON_WORDS:
+                words.pop(0)
+            if not words:
+                continue
+            name = " ".join(words)
+            start = match.start() + match.group(0).find(words[0])
+        name = re.sub(r"['’]s$", "", name)  # "Mr. Bingley's" -> "Mr. Bingley"
+
+        if name in known:
+            continue  # Already counted above
+
+        # A lone capitalized word opening a sentence is only a name if it is
+        # also capitalized mid-sentence somewhere else, or opens several sentences
+        at_sentence_start = start in sentence_starts or text[max(start - 1, 0)] in "\"“'‘"
+        if not match.group("title") and " " not in name and at_sentence_start:
+            sentence_initial.setdefault(name, []).append(start)
+        else:
+            candidates.setdefault(name, []).append(start)
+
+    for name, offsets in sentence_initial.items():
+        if name in candidates:
+            candidates[name].extend(offsets)
+        elif len(offsets) >= MIN_SENTENCE_INITIAL:
+            candidates[name] = offsets  # "Jude said..." / "Jude walked..."
+
+    return {name: sorted(offsets) for name, offsets in candidates.items()}
+
+
+def condense_text(text, known_names=(), context=CONTEXT_SENTENCES):
+    """Keep only sentences within `context` sentences of a candidate mention.
+
+    Returns (condensed text, {name: [offsets]}, stats dict).
+    """
+    candidates = find_candidates(text, known_names)
+    starts = segment_starts(text, SENTENCE_END)
+    ends = np.append(starts[1:], len(text))
+    n_sentences = len(starts)
+
+    keep = np.zeros(n_sentences, dtype=bool)
+    offsets = np.array([o for positions in candidates.values() for o in positions], dtype=np.int64)
+    if len(offsets):
+        keep[np.searchsorted(starts, offsets, side="right") - 1] = True
+        if context:
+            # "full" then slice, since mode="same" pads to the kernel length for short texts
+            keep = np.convolve(keep, np.ones(2 * context + 1), mode="full")[context:context + n_sentences] > 0
+
+    # One "[@offset] ..." line per run of kept sentences, OMITTED_MARKER between runs
+    parts = []
+    run_edges = np.flatnonzero(np.diff(np.concatenate(([0], keep.astype(np.int8), [0]))))
+    for run_start, run_end in zip(run_edges[::2], run_edges[1::2]):
+        if run_start > 0:
+            parts.append(OMITTED_MARKER)
+        parts.append(f"[@{starts[run_start]}] " + text[starts[run_start]:ends[run_end - 1]].strip())
+    if parts and keep[-1] == 0:
+        parts.append(OMITTED_MARKER)
+    condensed = "\n".join(parts)
+
+    stats = {
+        "original_tokens": estimate_tokens(text),
+        "condensed_tokens": estimate_tokens(condensed),
+        "sentences_kept": int(keep.sum()),
+        "sentences_total": n_sentences,
+    }
+    return condensed, candidates, stats
+
+
+def build_prefiltered_prompt_text(text, known_names=()):
+    """Condensed text plus a candidate list with positions, ready for a prompt"""
+    condensed, candidates, stats = condense_text(text, known_names)
+    if not candidates:
+        # Nothing recognizable; don't let a token-saving step drop the whole text
+        print("[Prefilter] no candidate names found; sending full text")
+        return text
+
+    candidate_lines = [
+        f"- {name}: {len(offsets)} mention(s), first at @{offsets[0]}"
+        for name, offsets in sorted(candidates.items(), key=lambda item: (-len(item[1]), item[1][0]))
+    ]
+    prompt_text = (
+        "Candidate names found in the text (mention count and character position):\n"
+        + ("\n".join(candidate_lines) or "- (none)")
+        + "\n\nRelevant passages (each starts with its character position; "
+        + f"{OMITTED_MARKER} marks omitted text without candidate names):\n"
+        + condensed
+    )
+
+    prompt_tokens = estimate_tokens(prompt_text)
+    if prompt_tokens >= stats["original_tokens"]:
+        # Dense text: nearly every sentence names someone, so send it as is
+        print(f"[Prefilter] {len(candidates)} candidates, no reduction possible; sending full text")
+        return text
+
+    reduction = 1 - prompt_tokens / max(stats["original_tokens"], 1)
+    print(f"[Prefilter] {len(candidates)} candidates, "
+          f"{stats['sentences_kept']}/{stats['sentences_total']} sentences kept, "
+          f"~{stats['original_tokens']:,} -> ~{prompt_tokens:,} tokens ({reduction:.0%} fewer)")
+    return prompt_text
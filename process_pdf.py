@@ -16,11 +16,15 @@ import os
 import json
 import PyPDF2
 from openai import OpenAI
+from rate_limiter import create_chat_completion
+from character_store import CharacterStore
+from prefilter import build_prefiltered_prompt_text, known_names_from
 
 # Configuration
 OUTPUT_FILE = "src/app/data/bookData.ts"
 CHAPTERS_DIR = "chapters"  # Put your chapter PDFs here
 API_KEY_FILE = ".openai_key"  # Store your API key here (gitignored)
+PREFILTER = True  # Send only sentences around candidate names instead of the whole book
 
 class PDFProcessor:
     def __init__(self):
@@ -98,6 +102,13 @@ class PDFProcessor:
             char_names = list(self.characters.keys())
             existing_context = f"\n\nExisting characters already identified:\n{', '.join(char_names)}\n\nPlease identify any NEW characters not in this list, and also update appearance counts for existing characters if they appear in this chapter."
 
+        prompt_text = all_text
+        if PREFILTER:
+            store = CharacterStore()
+            known_names = known_names_from(self.characters) | store.known_names(self.book_metadata["title"])
+            store.close()
+            prompt_text = build_prefiltered_prompt_text(all_text, known_names)
+
         prompt = f"""Analyze this chapter from a book and extract character information. Return a JSON object where each key is the character's name as it appears in the text, and the value contains:
 - name: Full character name
 - description: Brief 1-2 sentence description of who they are and their role
@@ -110,10 +121,11 @@ class PDFProcessor:
 Only extract main characters, not minor mentions. Return ONLY valid JSON, no markdown or explanation.
 
 Text:
-{all_text}"""
+{prompt_text}"""
 
         try:
-            response = self.client.chat.completions.create(
+            response = create_chat_completion(
+                self.client,
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -164,6 +176,16 @@ Text:
             for ch in self.chapters
         ]
 
+        # Store pages, characters and mentions, then export from the store
+        store = CharacterStore()
+        book_id = store.book_id(self.book_metadata["title"], self.book_metadata["author"], self.book_metadata["year"])
+        store.upsert_chapters(book_id, pages, prune=True)
+        store.upsert_characters(book_id, self.characters, prune=True)
+        store.index_mentions(book_id)
+        pages = store.load_chapters(book_id)
+        characters = store.load_characters(book_id)
+        store.close()
+
         ts_content = f'''/**
  * BOOK DATA CONFIGURATION
  * Generated by PDF Processor
@@ -188,7 +210,7 @@ export interface PageContent {{
 // ============================================
 // CHARACTER DEFINITIONS
 // ============================================
-export const characters: Record<string, Character> = {json.dumps(self.characters, indent=2)};
+export const characters: Record<string, Character> = {json.dumps(characters, indent=2)};
 
 // ============================================
 // BOOK PAGES/CHAPTERS
@@ -7,13 +7,17 @@ import os
 import json
 import PyPDF2
 from openai import OpenAI
+from rate_limiter import create_chat_completion
+from character_store import CharacterStore
+from prefilter import build_prefiltered_prompt_text, known_names_from
 
 # ====== EDIT THESE SETTINGS ======
-# Read API key from environment variable or .openai_key file
-API_KEY = os.getenv('OPENAI_API_KEY') or open('.openai_key', 'r').read().strip() 
+# Read API key from environment variable or .openai_key file (read when the client is created)
+API_KEY = os.getenv('OPENAI_API_KEY')
 BOOK_TITLE = "A Little Life"
 BOOK_AUTHOR = "Hanya Yanagihara"
 BOOK_YEAR = 2015
+PREFILTER = True  # Send only sentences around candidate names instead of the whole chapter
 
 # Chapter files to process (in order) - can be .pdf or .txt
 CHAPTER_FILES = [
@@ -48,7 +52,7 @@ def extract_text_from_file(file_path):
         raise Exception(f"Unsupported file type: {file_path}. Use .pdf or .txt files.")
 
 
-def extract_characters_with_llm(client, all_text, existing_characters=None):
+def extract_characters_with_llm(client, all_text, existing_characters=None, title=BOOK_TITLE):
     """Use LLM to extract characters"""
     print("\nExtracting characters with AI...")
 
@@ -57,6 +61,13 @@ def extract_characters_with_llm(client, all_text, existing_characters=None):
         char_names = list(existing_characters.keys())
         existing_context = f"\n\nExisting characters already identified:\n{', '.join(char_names)}\n\nPlease identify any NEW characters not in this list, and also update appearance counts for existing characters if they appear in this chapter."
 
+    prompt_text = all_text
+    if PREFILTER:
+        store = CharacterStore()
+        known_names = known_names_from(existing_characters) | store.known_names(title)
+        store.close()
+        prompt_text = build_prefiltered_prompt_text(all_text, known_names)
+
     prompt = f"""Analyze this chapter from a book and extract character information. Return a JSON object where each key is the character's name as it appears in the text, and the value contains:
 - name: Full character name
 - description: Brief 1-2 sentence description of who they are and their role
@@ -69,9 +80,10 @@ def extract_characters_with_llm(client, all_text, existing_characters=None):
 Only extract main characters, not minor mentions. Return ONLY valid JSON, no markdown or explanation.
 
 Text:
-{all_text}"""
+{prompt_text}"""
 
-    response = client.chat.completions.create(
+    response = create_chat_completion(
+        client,
         model="gpt-4o-mini",
         messages=[
             {
@@ -95,51 +107,17 @@ Text:
     return new_characters
 
 
-def main():
-    print("=" * 60)
-    print("  PDF Chapter Processor")
-    print("=" * 60)
-    print()
-
-    # Setup OpenAI client
-    client = OpenAI(api_key=API_KEY)
-    print("[OK] OpenAI API configured")
-    print(f"[OK] Book: {BOOK_TITLE} by {BOOK_AUTHOR}\n")
+def export_to_typescript(chapters, all_characters, title=BOOK_TITLE, author=BOOK_AUTHOR, year=BOOK_YEAR):
+    """Write chapters and characters to the store, then export src/app/data/bookData.ts from it"""
+    store = CharacterStore()
+    book_id = store.book_id(title, author, year)
+    store.upsert_chapters(book_id, chapters, prune=True)
+    store.upsert_characters(book_id, all_characters, prune=True)
+    store.index_mentions(book_id)
+    chapters = store.load_chapters(book_id)
+    all_characters = store.load_characters(book_id)
+    store.close()
 
-    # Process all chapters
-    chapters = []
-    all_characters = {}
-
-    for idx, chapter_file in enumerate(CHAPTER_FILES, 1):
-        if not os.path.exists(chapter_file):
-            print(f"[ERROR] File not found: {chapter_file}")
-            continue
-
-        # Extract text
-        text = extract_text_from_file(chapter_file)
-        chapters.append({
-            "chapter": f"Chapter {idx}",
-            "text": text
-        })
-
-        # Extract characters for this chapter
-        chapter_text = text
-        new_chars = extract_characters_with_llm(client, chapter_text, all_characters)
-
-        # Merge characters
-        for key, char in new_chars.items():
-            if key in all_characters:
-                all_characters[key]["appearances"] += char["appearances"]
-            else:
-                all_characters[key] = char
-
-        print(f"[OK] Total unique characters so far: {len(all_characters)}\n")
-
-    if not chapters:
-        print("[ERROR] No chapters processed")
-        return
-
-    # Export to TypeScript
     print(f"Exporting to src/app/data/bookData.ts...")
 
     ts_content = f'''/**
@@ -177,9 +155,9 @@ export const pages: PageContent[] = {json.dumps(chapters, indent=2)};
 // BOOK METADATA
 // ============================================
 export const bookMetadata = {{
-  title: {json.dumps(BOOK_TITLE)},
-  author: {json.dumps(BOOK_AUTHOR)},
-  year: {BOOK_YEAR}
+  title: {json.dumps(title)},
+  author: {json.dumps(author)},
+  year: {year}
 }};
 '''
 
@@ -187,6 +165,54 @@ export const bookMetadata = {{
     with open("src/app/data/bookData.ts", 'w', encoding='utf-8') as f:
         f.write(ts_content)
 
+
+def main():
+    print("=" * 60)
+    print("  PDF Chapter Processor")
+    print("=" * 60)
+    print()
+
+    # Setup OpenAI client
+    client = OpenAI(api_key=API_KEY or open('.openai_key', 'r').read().strip())
+    print("[OK] OpenAI API configured")
+    print(f"[OK] Book: {BOOK_TITLE} by {BOOK_AUTHOR}\n")
+
+    # Process all chapters
+    chapters = []
+    all_characters = {}
+
+    for idx, chapter_file in enumerate(CHAPTER_FILES, 1):
+        if not os.path.exists(chapter_file):
+            print(f"[ERROR] File not found: {chapter_file}")
+            continue
+
+        # Extract text
+        text = extract_text_from_file(chapter_file)
+        chapters.append({
+            "chapter": f"Chapter {idx}",
+            "text": text
+        })
+
+        # Extract characters for this chapter
+        chapter_text = text
+        new_chars = extract_characters_with_llm(client, chapter_text, all_characters)
+
+        # Merge characters
+        for key, char in new_chars.items():
+            if key in all_characters:
+                all_characters[key]["appearances"] += char["appearances"]
+            else:
+                all_characters[key] = char
+
+        print(f"[OK] Total unique characters so far: {len(all_characters)}\n")
+
+    if not chapters:
+        print("[ERROR] No chapters processed")
+        return
+
+    # Export to TypeScript
+    export_to_typescript(chapters, all_characters)
+
     print(f"[OK] Exported successfully!")
     print(f"\nGenerated:")
     print(f"  - {len(chapters)} chapter(s)")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Shared OpenAI Rate Limiter
+Token buckets for requests-per-minute and tokens-per-minute, shared by every
+script running on this machine through a small state file, and adjusted from
+the x-ratelimit-* headers the API returns.
+"""
+
+import os
+import json
+import re
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from openai import RateLimitError
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ====== CONFIGURATION ======
+STATE_FILE = ".openai_ratelimit.json"   # Shared bucket state (gitignored)
+LOCK_FILE = ".openai_ratelimit.lock"
+# Starting limits until the API tells us the real ones
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200000
+DEFAULT_COMPLETION_TOKENS = 1500        # Budgeted per request before usage is known
+MAX_RETRIES = 5
+MAX_WORKERS = 8                         # Upper bound on concurrent requests per script
+# ===========================
+
+
+def parse_reset_duration(value):
+    """Parse reset durations like '20ms', '1s', '6m0s' or '1h2m3.5s' into seconds"""
+    if not value:
+        return 0.0
+    seconds = 0.0
+    for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value):
+        seconds += float(amount) * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[unit]
+    return seconds
+
+
+def estimate_tokens(messages, completion_tokens=DEFAULT_COMPLETION_TOKENS):
+    """Rough token estimate for a chat request (about 4 characters per token)"""
+    prompt_chars = sum(len(m.get('content') or '') for m in messages)
+    return prompt_chars // 4 + completion_tokens
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock across processes"""
+    with open(path, 'a+') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        else:
+            lock.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class RateLimiter:
+    def __init__(self, state_file=STATE_FILE, lock_file=LOCK_FILE,
+                 requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.state_file = state_file
+        self.lock_file = lock_file
+        self.defaults = {
+            "requests": requests_per_minute,
+            "tokens": tokens_per_minute,
+        }
+
+    def _load(self, now):
+        """Read bucket state (caller holds the lock)"""
+        state = {}
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r') as f:
+                    state = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                state = {}
+
+        for name, capacity in self.defaults.items():
+            bucket = state.setdefault(name, {"capacity": capacity, "level": capacity, "updated": now})
+            # Refill continuously at capacity per minute
+            elapsed = max(now - bucket["updated"], 0.0)
+            bucket["level"] = min(bucket["capacity"], bucket["level"] + elapsed * bucket["capacity"] / 60)
+            bucket["updated"] = now
+        state.setdefault("blocked_until", 0.0)
+        return state
+
+    def _save(self, state):
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_file)
+
+    def acquire(self, tokens):
+        """Block until one request and `tokens` tokens are available, then take them"""
+        while True:
+            with file_lock(self.lock_file):
+                now = time.time()
+                state = self._load(now)
+                need = {"requests": 1, "tokens": min(tokens, state["tokens"]["capacity"])}
+
+                wait = state["blocked_until"] - now
+                if wait <= 0:
+                    wait = max(
+                        (need[name] - state[name]["level"]) * 60 / state[name]["capacity"]
+                        for name in need
+                    )
+                    if wait <= 0:
+                        for name, amount in need.items():
+                            state[name]["level"] -= amount
+                        self._save(state)
+                        return
+                self._save(state)
+
+            time.sleep(min(max(wait, 0.05), 5.0))
+
+    def update_from_headers(self, headers, estimated_tokens=None, used_tokens=None):
+        """Adopt the account limits and remaining quota reported by the API.
+
+        Without a remaining-tokens header, the difference between the estimate
+        and real usage is given back (or charged); with one, the server's count
+        already includes this request and is used as is.
+        """
+        with file_lock(self.lock_file):
+            state = self._load(time.time())
+
+            applied = set()
+            for name in ("requests", "tokens"):
+                limit = headers.get(f"x-ratelimit-limit-{name}")
+                remaining = headers.get(f"x-ratelimit-remaining-{name}")
+                if limit and limit.isdigit():
+                    state[name]["capacity"] = int(limit)
+                if remaining and remaining.isdigit():
+                    # The server also counts other clients using this key
+                    state[name]["level"] = min(state[name]["level"], int(remaining))
+                    applied.add(name)
+
+            # Give back (or charge) the difference between the estimate and real usage
+            if "tokens" not in applied and estimated_tokens is not None and used_tokens is not None:
+                bucket = state["tokens"]
+                bucket["level"] = min(bucket["capacity"], bucket["level"] + estimated_tokens - used_tokens)
+
+            self._save(state)
+
+    def suggested_workers(self, tokens_per_request, max_workers=MAX_WORKERS):
+        """How many requests of this size can run at once right now, from the
+        quota left in the buckets (last set from x-ratelimit-remaining-*)"""
+        with file_lock(self.lock_file):
+            now = time.time()
+            state = self._load(now)
+        if state["blocked_until"] > now:
+            return 1
+        room = min(state["requests"]["level"], state["tokens"]["level"] / max(tokens_per_request, 1))
+        return max(1, min(max_workers, int(room)))
+
+    def block_for(self, seconds):
+        """Pause every process sharing this limiter (after a 429)"""
+        with file_lock(self.lock_file):
+            state = self._load(time.time())
+            state["blocked_until"] = max(state["blocked_until"], time.time() + seconds)
+            self._save(state)
+
+
+_default_limiter = None
+
+
+def get_rate_limiter():
+    """Limiter shared by all scripts in this directory"""
+    global _default_limiter
+    if _default_limiter is None:
+        _default_limiter = RateLimiter()
+    return _default_limiter
+
+
+def set_rate_limiter(limiter):
+    """Replace the shared limiter (e.g. with one on a private state file)"""
+    global _default_limiter
+    _default_limiter = limiter
+
+
+def create_chat_completion(client, limiter=None, **kwargs):
+    """Rate-limited drop-in for client.chat.completions.create(**kwargs)"""
+    limiter = limiter or get_rate_limiter()
+    estimated = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire(estimated)
+        try:
+            raw = client.chat.completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            if attempt == MAX_RETRIES:
+                raise
+            headers = e.response.headers
+            retry_after = headers.get("retry-after")
+            wait = float(retry_after) if retry_after and retry_after.replace('.', '', 1).isdigit() else max(
+                parse_reset_duration(headers.get("x-ratelimit-reset-requests")),
+                parse_reset_duration(headers.get("x-ratelimit-reset-tokens")),
+                2.0 ** attempt
+            )
+            print(f"[WAIT] Rate limited, pausing {wait:.1f}s (attempt {attempt + 1}/{MAX_RETRIES})")
+            # The rejected request used nothing; refund it before the retry charges again
+            limiter.update_from_headers(headers, estimated, 0)
+            limiter.block_for(wait)
+            continue
+
+        response = raw.parse()
+        used = response.usage.total_tokens if getattr(response, "usage", None) else None
+        limiter.update_from_headers(raw.headers, estimated, used)
+        return response
+
+
+def map_concurrently(func, items, tokens_per_request, limiter=None, max_workers=MAX_WORKERS):
+    """Run func over items on a thread pool, in waves sized by suggested_workers()
+    so concurrency follows the quota the API reports; results keep input order"""
+    limiter = limiter or get_rate_limiter()
+    items = list(items)
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while len(results) < len(items):
+            workers = limiter.suggested_workers(tokens_per_request, max_workers)
+            results.extend(pool.map(func, items[len(results):len(results) + workers]))
+    return results
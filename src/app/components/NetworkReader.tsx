@@ -1,16 +1,7 @@
 import { useState } from 'react';
 import { BookOpen, Settings, Sun, X } from 'lucide-react';
-import { characters, bookMetadata } from '../data/bookData';
-import { getExcerptForMode } from '../data/excerptLoader';
-
-// Node positions for the network visualization
-const nodePositions: Record<string, { x: number; y: number }> = {
-  'Elizabeth': { x: 350, y: 200 },
-  'Mr. Darcy': { x: 550, y: 200 },
-  'Jane': { x: 250, y: 320 },
-  'Mr. Bingley': { x: 650, y: 320 },
-  'Mrs. Bennet': { x: 300, y: 450 }
-};
+import { characters, bookMetadata, nodeLayouts } from '../data/bookData';
+import { getExcerptForMode, getExcerptName } from '../data/excerptLoader';
 
 export function NetworkReader() {
   const [fontSize, setFontSize] = useState(18);
@@ -21,6 +12,10 @@ export function NetworkReader() {
   // Load excerpt based on condition and mode for counterbalancing
   const pages = getExcerptForMode('network');
 
+  // Node positions for the network visualization (precomputed by extract_characters.py)
+  const excerptName = getExcerptName(pages);
+  const nodePositions = (excerptName ? nodeLayouts[excerptName] : undefined) ?? {};
+
   const handleCharacterClick = (characterName: string) => {
     console.log('Character clicked:', characterName);
     if (characters[characterName]) {
@@ -121,6 +116,19 @@ export function NetworkReader() {
     const allConnectedChars = new Set([selectedCharacter]);
     character.relationships.forEach(rel => allConnectedChars.add(rel.character));
 
+    // Order related characters by their direction from the selected character in the
+    // precomputed layout, so the circle keeps the same neighbourhood shape as the graph
+    const layoutAngle = (name: string) => {
+      const from = nodePositions[selectedCharacter];
+      const to = nodePositions[name];
+      if (!from || !to) return 2 * Math.PI;
+      const angle = Math.atan2(to.y - from.y, to.x - from.x) + Math.PI / 2;
+      return (angle + 2 * Math.PI) % (2 * Math.PI);
+    };
+    const relationships = [...character.relationships].sort(
+      (a, b) => layoutAngle(a.character) - layoutAngle(b.character)
+    );
+
     const getRelationshipColor = (type: string) => {
       const colors: Record<string, string> = {
         'Love Interest': '#e11d48',
@@ -173,7 +181,7 @@ export function NetworkReader() {
                     <polygon points="0 0, 10 3, 0 6" fill="#9ca3af" />
                   </marker>
                 </defs>
-                {character.relationships.map((rel, index) => {
+                {relationships.map((rel, index) => {
                   const angle = angleStep * index - Math.PI / 2;
                   const endX = centerX + radius * Math.cos(angle);
                   const endY = centerY + radius * Math.sin(angle);
@@ -228,7 +236,7 @@ export function NetworkReader() {
               </div>
 
               {/* Connected Characters in Circle */}
-              {character.relationships.map((rel, index) => {
+              {relationships.map((rel, index) => {
                 const angle = angleStep * index - Math.PI / 2;
                 const x = centerX + radius * Math.cos(angle);
                 const y = centerY + radius * Math.sin(angle);
@@ -188,6 +188,36 @@ export const characters: Record<string, Character> = {
   },
 };
 
+// ============================================
+// NETWORK LAYOUT (generated by network_layout.py)
+// ============================================
+export const nodeLayouts: Record<string, Record<string, { x: number; y: number }>> = {
+  excerptA: {
+    "Mr. Bennet": { x: 553, y: 209 },
+    "Mrs. Bennet": { x: 567, y: 362 },
+    "Mrs. Long": { x: 80, y: 329 },
+  },
+  excerptB: {
+    "Mazarin": { x: 376, y: 259 },
+    "Montargis": { x: 543, y: 288 },
+    "Orl\u00e9ans": { x: 322, y: 420 },
+    "Prince de Cond\u00e9": { x: 491, y: 453 },
+    "Richelieu": { x: 268, y: 80 },
+  },
+  excerptC: {
+    "Elizabeth": { x: 513, y: 86 },
+    "Jane": { x: 508, y: 353 },
+    "Mr. Darcy": { x: 295, y: 241 },
+    "Mr. Bingley": { x: 283, y: 520 },
+  },
+  excerptD: {
+    "Mr. Bingley": { x: 383, y: 80 },
+    "Mrs. Bennet": { x: 620, y: 312 },
+    "Lady Lucas": { x: 270, y: 377 },
+    "Sir William": { x: 326, y: 431 },
+  },
+};
+
 // ============================================
 // BOOK PAGES/CHAPTERS
 // Four different excerpts for counterbalancing in experiments
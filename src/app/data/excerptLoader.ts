@@ -16,6 +16,21 @@ const COUNTERBALANCING: Record<number, Record<string, PageContent[]>> = {
   4: { tabbed: excerptD, clickable: excerptA, network: excerptB, llm: excerptC },
 };
 
+const EXCERPT_NAMES = new Map<PageContent[], string>([
+  [excerptA, 'excerptA'],
+  [excerptB, 'excerptB'],
+  [excerptC, 'excerptC'],
+  [excerptD, 'excerptD'],
+]);
+
+/**
+ * Get the bookData export name of an excerpt (e.g. 'excerptC')
+ * Used to look up per-excerpt data generated by the Python pipeline, such as nodeLayouts
+ */
+export function getExcerptName(excerpt: PageContent[]): string | undefined {
+  return EXCERPT_NAMES.get(excerpt);
+}
+
 /**
  * Get excerpt based on URL parameters for experimental counterbalancing
  *
@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prefilter import OMITTED_MARKER, build_prefiltered_prompt_text, condense_text, find_candidates
+
+
+def test_condense_one_sentence():
+    text = "The rain fell on Elizabeth and Darcy"
+    for context in (0, 1):
+        condensed, candidates, stats = condense_text(text, context=context)
+        assert set(candidates) == {"Elizabeth", "Darcy"}
+        assert (stats["sentences_kept"], stats["sentences_total"]) == (1, 1)
+        assert condensed == "[@0] " + text
+
+
+def test_condense_two_sentences():
+    text = "It rained. Then Elizabeth walked home."
+    condensed, _, stats = condense_text(text, context=0)
+    assert (stats["sentences_kept"], stats["sentences_total"]) == (1, 2)
+    assert condensed == f"{OMITTED_MARKER}\n[@11] Then Elizabeth walked home."
+
+    condensed, _, stats = condense_text(text, context=1)
+    assert (stats["sentences_kept"], stats["sentences_total"]) == (2, 2)
+    assert condensed == "[@0] " + text
+
+
+def test_short_texts_build_a_prompt():
+    for text in ("The rain fell on Elizabeth and Mr. Darcy",
+                 "It rained ... nobody came. Then Elizabeth walked home."):
+        assert "Elizabeth" in build_prefiltered_prompt_text(text)
+
+
+def test_repeated_sentence_initial_name_is_a_candidate():
+    text = "Jude said nothing. The room was cold. Jude walked to the window."
+    assert find_candidates(text) == {"Jude": [0, 38]}
+
+
+def test_no_candidates_sends_full_text():
+    text = "Elizabeth walked home."
+    assert build_prefiltered_prompt_text(text) == text
+
+
+def test_title_abbreviations_do_not_end_sentences():
+    text = "Mr. Bennet spoke to Mrs. Bennet at length. Then Dr. Whitlock left."
+    _, candidates, stats = condense_text(text)
+    assert stats["sentences_total"] == 2
+    assert {"Mr. Bennet", "Mrs. Bennet", "Dr. Whitlock"} <= set(candidates)
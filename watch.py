@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Watch Mode - keep the extraction pipeline warm and reprocess only what changed
+
+Keeps one OpenAI client and the per-excerpt / per-chapter extraction results
+in memory, and re-runs the LLM only for excerpts (or files) whose content hash
+changed. Watches one source at a time, since both write bookData.ts:
+
+  - default: an excerpt in bookData.ts changed -> re-extract that excerpt,
+    update the characters and network layouts (same output as extract_characters.py)
+  - --chapters: chapters/*.pdf|*.txt changed -> re-extract that chapter and
+    replace bookData.ts with the chapters (same output as quick_process.py)
+
+On startup the current content counts as processed: results are seeded from
+the characters already in bookData.ts (or the character store for chapters),
+so only real edits cost API calls. In excerpt mode the characters block is
+read again before every write, so hand corrections made while the watcher
+runs are kept too.
+
+Usage:
+    python watch.py
+    python watch.py --chapters --title "A Little Life" --author "Hanya Yanagihara" --year 2015
+
+Stop with Ctrl+C.
+"""
+
+import os
+import copy
+import time
+import hashlib
+import argparse
+from openai import OpenAI
+
+import extract_characters
+import quick_process
+from character_store import CharacterStore
+from cooccurrence import find_mentions
+from extract_characters import BOOK_DATA_PATH, load_api_key, merge_characters
+from process_pdf import CHAPTERS_DIR
+
+# ====== CONFIGURATION ======
+POLL_INTERVAL = 0.25    # Seconds between file checks
+SETTLE_TIME = 0.2       # File must be unchanged this long before processing (editors save in steps)
+RETRY_DELAY = 10.0      # Seconds to wait after a failed run before retrying
+CHAPTER_EXTENSIONS = ('.pdf', '.txt')
+# ===========================
+
+
+def content_hash(data):
+    """Stable hash of file or excerpt content"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def split_characters(characters, texts):
+    """Split merged characters into per-text results that merge back into the
+    same characters: each text gets the characters it mentions, with a share of
+    the appearances proportional to its mentions.
+
+    Returns ({text name: characters}, characters no text mentions verbatim).
+    """
+    names = list(texts)
+    per_text = {name: {} for name in names}
+    unmatched = {}
+
+    counts = {key: [0] * len(names) for key in characters}
+    for i, name in enumerate(names):
+        keys, (rows, _) = find_mentions(texts[name], characters)
+        for row in rows:
+            counts[keys[row]][i] += 1
+
+    for key, char in characters.items():
+        mentions = counts[key]
+        if not any(mentions):
+            unmatched[key] = copy.deepcopy(char)
+            continue
+        total, seen, given = sum(mentions), 0, 0
+        for name, count in zip(names, mentions):
+            if not count:
+                continue
+            seen += count
+            share = round(char.get('appearances', 1) * seen / total) - given
+            given += share
+            per_text[name][key] = dict(copy.deepcopy(char), appearances=share)
+    return per_text, unmatched
+
+
+def merge_results(results, unmatched):
+    """Merge per-text results in order, then add back characters no text
+    mentions by name (e.g. hand-added ones) unless a result already has them"""
+    all_characters = {}
+    for characters in results:
+        all_characters = merge_characters(all_characters, copy.deepcopy(characters))
+    for key, char in unmatched.items():
+        all_characters.setdefault(key, copy.deepcopy(char))
+    return all_characters
+
+
+class Watcher:
+    def __init__(self, chapters=False, title=None, author=None, year=None):
+        self.chapters = chapters
+        self.book = {"title": title, "author": author, "year": year}
+        self.client = None
+        self.stats = {}            # path -> (mtime, size) last processed
+        self.chapter_cache = {}    # path -> {"hash", "text", "characters"}
+        self.excerpt_cache = {}    # excerpt name -> {"hash", "text" last written, "characters"}
+        self.extracted = set()     # Excerpts with LLM results not yet written to bookData.ts
+        self.unmatched = {}        # Characters not tied to any one text; never re-extracted
+        self.bookdata_hash = None
+        self.dirty = False         # Results changed but bookData.ts not yet written
+
+    def setup_api(self):
+        """Create the OpenAI client once for the whole session"""
+        self.client = OpenAI(api_key=load_api_key())
+        print("[OK] OpenAI API configured")
+
+    def pending_signature(self, path):
+        """Stat signature of path if it changed since it was last processed and
+        has settled, else None; the content hash decides whether work is needed"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if self.stats.get(path) == signature:
+            return None
+        if time.time() - stat.st_mtime < SETTLE_TIME:
+            return None  # Still being written, pick it up next poll
+        return signature
+
+    # ---------- chapters ----------
+
+    def chapter_files(self):
+        if not os.path.isdir(CHAPTERS_DIR):
+            return []
+        return sorted(
+            os.path.join(CHAPTERS_DIR, f)
+            for f in os.listdir(CHAPTERS_DIR)
+            if f.lower().endswith(CHAPTER_EXTENSIONS)
+        )
+
+    def merged_chapter_characters(self, exclude=None):
+        return merge_results(
+            [
+                self.chapter_cache[path]["characters"] for path in self.chapter_files()
+                if path in self.chapter_cache and path != exclude
+            ],
+            self.unmatched
+        )
+
+    def seed_chapters(self):
+        """Treat the current chapter files as processed, using the stored characters"""
+        store = CharacterStore()
+        book_id = store.book_id(self.book["title"], self.book["author"], self.book["year"])
+        characters = store.load_characters(book_id)
+        store.close()
+        if not characters:
+            print(f"[WARN] No stored characters for '{self.book['title']}'; run quick_process.py first "
+                  f"or edited chapters will only contribute their own characters")
+
+        texts, hashes = {}, {}
+        for path in self.chapter_files():
+            with open(path, 'rb') as f:
+                hashes[path] = content_hash(f.read())
+            texts[path] = quick_process.extract_text_from_file(path)
+        per_text, self.unmatched = split_characters(characters, texts)
+        for path, chars in per_text.items():
+            self.chapter_cache[path] = {"hash": hashes[path], "text": texts[path], "characters": chars}
+
+    def check_chapters(self):
+        """Re-extract chapters whose content changed and rewrite bookData.ts"""
+        files = self.chapter_files()
+        removed = [path for path in self.chapter_cache if path not in files]
+        for path in removed:
+            del self.chapter_cache[path]
+            self.stats.pop(path, None)
+            self.dirty = True
+            print(f"[-] {os.path.basename(path)} removed")
+
+        changed = {}
+        for path in files:
+            signature = self.pending_signature(path)
+            if signature:
+                changed[path] = signature
+
+        for path, signature in changed.items():
+            with open(path, 'rb') as f:
+                digest = content_hash(f.read())
+            if self.chapter_cache.get(path, {}).get("hash") != digest:
+                start = time.time()
+                text = quick_process.extract_text_from_file(path)
+                characters = quick_process.extract_characters_with_llm(
+                    self.client, text, self.merged_chapter_characters(exclude=path), self.book["title"]
+                )
+                self.chapter_cache[path] = {"hash": digest, "text": text, "characters": characters}
+                self.dirty = True
+                print(f"[OK] {os.path.basename(path)} reprocessed in {time.time() - start:.1f}s")
+            # Only now is this version done; a failure above leaves it pending for a retry
+            self.stats[path] = signature
+
+        if not self.dirty:
+            return
+        chapters = [
+            {"chapter": f"Chapter {idx}", "text": self.chapter_cache[path]["text"]}
+            for idx, path in enumerate(files, 1)
+            if path in self.chapter_cache
+        ]
+        quick_process.export_to_typescript(
+            chapters, self.merged_chapter_characters(), self.book["title"], self.book["author"], self.book["year"]
+        )
+        self.dirty = False
+        print(f"[OK] Pushed {len(chapters)} chapter(s) to {BOOK_DATA_PATH}\n")
+
+    # ---------- excerpts ----------
+
+    def seed_excerpts(self):
+        """Treat the excerpts and characters currently in bookData.ts as processed"""
+        excerpts = extract_characters.extract_excerpts_from_bookdata(BOOK_DATA_PATH)
+        self.excerpt_cache = {
+            name: {"hash": content_hash(text), "text": text, "characters": {}}
+            for name, text in excerpts.items()
+        }
+        self.reload_excerpt_characters()
+        self.remember_bookdata()
+
+    def reload_excerpt_characters(self):
+        """Re-split the characters block of bookData.ts (hand edits included) over
+        the excerpt texts it was written from; excerpts with new LLM results that
+        are not written yet keep them"""
+        characters = extract_characters.extract_characters_from_bookdata(BOOK_DATA_PATH)
+        per_text, self.unmatched = split_characters(
+            characters, {name: cached["text"] for name, cached in self.excerpt_cache.items()}
+        )
+        for name, cached in self.excerpt_cache.items():
+            if name not in self.extracted:
+                cached["characters"] = per_text[name]
+
+    def check_bookdata(self):
+        """Re-extract only the excerpts in bookData.ts whose text changed"""
+        signature = self.pending_signature(BOOK_DATA_PATH)
+        if not signature:
+            return
+        with open(BOOK_DATA_PATH, 'rb') as f:
+            digest = content_hash(f.read())
+        if digest == self.bookdata_hash and not self.dirty:
+            self.stats[BOOK_DATA_PATH] = signature
+            return
+
+        excerpts = extract_characters.extract_excerpts_from_bookdata(BOOK_DATA_PATH)
+        if not excerpts:
+            self.bookdata_hash = digest
+            self.stats[BOOK_DATA_PATH] = signature
+            return
+
+        # Pick up hand edits to the characters before anything is rewritten
+        self.reload_excerpt_characters()
+
+        for name in [name for name in self.excerpt_cache if name not in excerpts]:
+            del self.excerpt_cache[name]
+            self.extracted.discard(name)
+            self.dirty = True
+
+        changed = [
+            name for name, text in excerpts.items()
+            if self.excerpt_cache.get(name, {}).get("hash") != content_hash(text)
+        ]
+        start = time.time()
+        for name in changed:
+            characters = extract_characters.extract_characters_with_llm(self.client, excerpts[name], name)
+            self.excerpt_cache[name] = {
+                "hash": content_hash(excerpts[name]),
+                "text": self.excerpt_cache.get(name, {}).get("text", excerpts[name]),
+                "characters": characters
+            }
+            self.extracted.add(name)
+            self.dirty = True
+
+        if self.dirty:
+            all_characters = merge_results(
+                [self.excerpt_cache[name]["characters"] for name in excerpts], self.unmatched
+            )
+            extract_characters.write_characters(all_characters, excerpts)
+            for name, text in excerpts.items():
+                self.excerpt_cache[name]["text"] = text
+            self.extracted.clear()
+            self.dirty = False
+            print(f"[OK] {len(changed)} excerpt(s) reprocessed in {time.time() - start:.1f}s\n")
+
+        # Our own write changes the file again; remember its hash so it isn't reprocessed
+        self.remember_bookdata()
+
+    def remember_bookdata(self):
+        with open(BOOK_DATA_PATH, 'rb') as f:
+            self.bookdata_hash = content_hash(f.read())
+
+    def run(self):
+        print("=" * 60)
+        print("  Watch Mode")
+        print("=" * 60)
+        self.setup_api()
+        if self.chapters:
+            self.seed_chapters()
+            print(f"Watching {CHAPTERS_DIR}/ for '{self.book['title']}'; "
+                  f"{BOOK_DATA_PATH} is replaced on every change (Ctrl+C to stop)\n")
+        else:
+            self.seed_excerpts()
+            print(f"Watching the excerpts in {BOOK_DATA_PATH} (Ctrl+C to stop)\n")
+
+        while True:
+            try:
+                if self.chapters:
+                    self.check_chapters()
+                else:
+                    self.check_bookdata()
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                print(f"[ERROR] {e}; retrying in {RETRY_DELAY:.0f}s\n")
+                time.sleep(RETRY_DELAY)
+                continue
+            time.sleep(POLL_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess changed excerpts or chapters on save")
+    parser.add_argument("--chapters", action="store_true",
+                        help=f"watch {CHAPTERS_DIR}/ instead of the excerpts (replaces {BOOK_DATA_PATH})")
+    parser.add_argument("--title", help="book title (required with --chapters)")
+    parser.add_argument("--author", help="book author (required with --chapters)")
+    parser.add_argument("--year", type=int, help="publication year (required with --chapters)")
+    args = parser.parse_args()
+
+    if args.chapters and not (args.title and args.author and args.year):
+        parser.error("--chapters needs --title, --author and --year")
+    if not args.chapters and (args.title or args.author or args.year):
+        parser.error("--title, --author and --year only apply with --chapters")
+
+    try:
+        Watcher(args.chapters, args.title, args.author, args.year).run()
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+if __name__ == "__main__":
+    main()